@@ -5,7 +5,7 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
@@ -21,16 +21,17 @@ db = None
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
+# Pool limits apply per process: with WEB_CONCURRENCY uvicorn workers the server
+# may hold up to WEB_CONCURRENCY * MONGO_MAX_POOL_SIZE connections, so keep that
+# product under the cluster's connection limit.
+max_pool_size = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+min_pool_size = int(os.getenv("MONGO_MIN_POOL_SIZE", 5))
+
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    _client = AsyncIOMotorClient(database_url, maxPoolSize=max_pool_size, minPoolSize=min_pool_size)
     db = _client[database_name]
 
-# Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
-    if db is None:
-        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-
+def _prepare_document(data: Union[BaseModel, dict]) -> dict:
     # Convert Pydantic model to dict if needed
     if isinstance(data, BaseModel):
         data_dict = data.model_dump()
@@ -39,8 +40,17 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
 
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
+    return data_dict
 
-    result = db[collection_name].insert_one(data_dict)
+# Helper functions for common database operations
+# The sync helpers go through the underlying PyMongo handle (db.delegate) so
+# scripts can keep using them; API endpoints should use the *_async variants.
+def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = db.delegate[collection_name].insert_one(_prepare_document(data))
     return str(result.inserted_id)
 
 def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
@@ -48,8 +58,27 @@ def get_documents(collection_name: str, filter_dict: dict = None, limit: int = N
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = db.delegate[collection_name].find(filter_dict or {})
     if limit:
         cursor = cursor.limit(limit)
     
     return list(cursor)
+
+async def create_document_async(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp (non-blocking)"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = await db[collection_name].insert_one(_prepare_document(data))
+    return str(result.inserted_id)
+
+async def get_documents_async(collection_name: str, filter_dict: dict = None, limit: int = None):
+    """Get documents from collection (non-blocking)"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    cursor = db[collection_name].find(filter_dict or {})
+    if limit:
+        cursor = cursor.limit(limit)
+
+    return await cursor.to_list(length=limit)
@@ -1,24 +1,101 @@
+import asyncio
+import logging
 import os
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, Depends
+import marisa_trie
+import orjson
+from fastapi import FastAPI, HTTPException, Depends, Response, Security
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from fastapi.security import APIKeyHeader
+from cachetools import TTLCache
+from pydantic import BaseModel, EmailStr, Field
 from uuid import uuid4
 
-from database import db, create_document, get_documents
-from schemas import User, Session, Application, Payment, SearchItem
+from database import db, create_document_async
+from schemas import User, Session, Application, Payment, SearchItem, DocType
 
-app = FastAPI(title="Citizen Hub API", description="Public service platform for Indian ID applications")
+logger = logging.getLogger("uvicorn.error")
 
+def _collection(name: str):
+    return db[name]
+
+# Coarse UTC clock for expiry checks on the hot path, refreshed every 50 ms by a
+# background task instead of building a tz-aware datetime per request.
+_NOW = datetime.now(timezone.utc)
+_now_ticker_task: Optional[asyncio.Task] = None
+
+async def _now_ticker():
+    global _NOW
+    while True:
+        _NOW = datetime.now(timezone.utc)
+        await asyncio.sleep(0.05)
+
+def _utcnow() -> datetime:
+    # Without a running ticker (lifespan disabled, TestClient outside `with`)
+    # _NOW would be frozen, so read the real clock instead.
+    if _now_ticker_task is None or _now_ticker_task.done():
+        return datetime.now(timezone.utc)
+    return _NOW
+
+async def _ensure_indexes():
+    if db is None:
+        return
+    # Token lookups hit this on every authenticated request; the TTL index lets
+    # Mongo purge expired sessions instead of them piling up in the collection.
+    # Runs in the background so an unreachable Mongo never delays startup:
+    # /, /search and /guides work without it, and /test reports the error.
+    # Each index is attempted on its own so one conflict does not skip the rest.
+    indexes = [
+        ("session", "token", {"unique": True}),
+        ("session", "expires_at", {"expireAfterSeconds": 0}),
+        ("application", "user_email", {}),
+    ]
+    for collection, field, options in indexes:
+        try:
+            await _collection(collection).create_index(field, **options)
+        except Exception as e:
+            logger.warning("Could not create MongoDB index %s.%s: %s", collection, field, e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _now_ticker_task
+    _now_ticker_task = asyncio.create_task(_now_ticker())
+    indexes_task = asyncio.create_task(_ensure_indexes())
+    try:
+        yield
+    finally:
+        indexes_task.cancel()
+        _now_ticker_task.cancel()
+        _now_ticker_task = None
+
+app = FastAPI(
+    title="Citizen Hub API",
+    description="Public service platform for Indian ID applications",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+
+# Explicit origins (comma-separated CORS_ORIGINS) instead of "*", and a day-long
+# max_age so browsers cache preflights rather than re-sending OPTIONS
+cors_origins = [o.strip() for o in os.getenv("CORS_ORIGINS", "").split(",") if o.strip()]
+if not cors_origins:
+    logger.warning("CORS_ORIGINS is not set; all cross-origin browser requests will be rejected")
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=cors_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["X-Token", "Content-Type"],
+    max_age=86400,
 )
+# Guides and search results are text-heavy; tiny bodies are not worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=512)
 
 class LoginRequest(BaseModel):
     email: EmailStr
@@ -30,26 +107,36 @@ class LoginResponse(BaseModel):
     email: EmailStr
     name: Optional[str] = None
 
+# Request bodies carry the same constraints as the stored Application/Payment
+# schemas, so handlers can persist them without re-validating
 class ApplicationCreate(BaseModel):
-    doc_type: str
+    doc_type: DocType
     metadata: dict = {}
 
 class PaymentInit(BaseModel):
     purpose: str
-    amount: float
+    amount: float = Field(..., ge=0)
     application_ref: Optional[str] = None
 
-# Simple in-memory token check is NOT allowed; persist sessions instead
+# Server-side defaults for stored documents, taken from the schemas so they cannot drift.
+# Request payload fields are merged over these, so shared mutable defaults are never stored.
+def _schema_defaults(model) -> dict:
+    return {name: f.get_default(call_default_factory=True) for name, f in model.model_fields.items() if not f.is_required()}
 
-def _collection(name: str):
-    return db[name]
+_APPLICATION_DEFAULTS = _schema_defaults(Application)
+_PAYMENT_DEFAULTS = _schema_defaults(Payment)
+
+# Simple in-memory token check is NOT allowed; persist sessions instead.
+# Sessions live in Mongo; this is only a short-lived read-through cache of
+# token -> (user_email, expires_at) so hot tokens skip the round trip.
+_SESSION_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=60)
 
 @app.get("/")
-def root():
+async def root():
     return {"message": "Citizen Hub API running"}
 
 @app.get("/test")
-def test_database():
+async def test_database():
     info = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -57,61 +144,86 @@ def test_database():
     }
     try:
         info["database"] = "✅ Connected" if db is not None else "❌ Not Available"
-        if db:
-            info["collections"] = db.list_collection_names()
+        if db is not None:
+            info["collections"] = await db.list_collection_names()
     except Exception as e:
         info["database"] = f"⚠️ {str(e)[:80]}"
     return info
 
 # Auth: passwordless email login (demo). In real deployments, integrate OTP/OAuth.
 @app.post("/auth/login", response_model=LoginResponse)
-def login(req: LoginRequest):
+async def login(req: LoginRequest):
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
 
-    # Upsert user
-    _collection("user").update_one({"email": req.email}, {"$setOnInsert": {"name": req.name or "Citizen", "email": req.email, "preferred_language": req.preferred_language or "en", "is_active": True}}, upsert=True)
-
     token = uuid4().hex
     expires = datetime.now(timezone.utc) + timedelta(days=7)
-    create_document("session", Session(user_email=req.email, token=token, expires_at=expires))
+    # Upsert user and persist the session concurrently; neither depends on the other.
+    # Unlike running them in sequence, the session can land even though the upsert
+    # failed, so remove it again rather than leave a session with no user behind it.
+    user_res, session_res = await asyncio.gather(
+        _collection("user").update_one({"email": req.email}, {"$setOnInsert": {"name": req.name or "Citizen", "email": req.email, "preferred_language": req.preferred_language or "en", "is_active": True}}, upsert=True),
+        create_document_async("session", Session(user_email=req.email, token=token, expires_at=expires)),
+        return_exceptions=True,
+    )
+    if isinstance(user_res, Exception):
+        if not isinstance(session_res, Exception):
+            try:
+                await _collection("session").delete_one({"token": token})
+            except Exception as e:
+                logger.warning("Could not remove orphaned session after failed login: %s", e)
+        raise user_res
+    if isinstance(session_res, Exception):
+        raise session_res
     return LoginResponse(token=token, email=req.email, name=req.name)
 
-# Middleware-like dependency to fetch session
-class AuthToken(BaseModel):
-    token: str
+# Session token travels in the X-Token header. auto_error is off so a missing
+# header gets the same 401 as a bad token rather than FastAPI's default 403.
+api_key = APIKeyHeader(name="X-Token", auto_error=False)
 
-async def get_user_from_token(token: str) -> str:
+async def get_current_user(token: Optional[str] = Security(api_key)) -> str:
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing token")
+    now = _utcnow()
+    cached = _SESSION_CACHE.get(token)
+    if cached is not None:
+        user_email, expires_at = cached
+        if expires_at > now:
+            return user_email
+        _SESSION_CACHE.pop(token, None)
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
     if db is None:
         raise HTTPException(status_code=500, detail="Database not configured")
-    sess = _collection("session").find_one({"token": token, "expires_at": {"$gt": datetime.now(timezone.utc)}})
+    sess = await _collection("session").find_one({"token": token, "expires_at": {"$gt": now}})
     if not sess:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    # PyMongo hands back naive UTC datetimes
+    expires_at = sess["expires_at"].replace(tzinfo=timezone.utc)
+    _SESSION_CACHE[token] = (sess["user_email"], expires_at)
     return sess["user_email"]
 
 # Applications
 @app.post("/applications", response_model=dict)
-def create_application(payload: ApplicationCreate, token: str):
-    user_email = awaitable_get_user(token)
-    app_doc = Application(user_email=user_email, doc_type=payload.doc_type, metadata=payload.metadata)
-    ref = create_document("application", app_doc)
-    return {"reference": ref, "status": app_doc.status}
+async def create_application(payload: ApplicationCreate, user_email: str = Depends(get_current_user)):
+    app_doc = {**_APPLICATION_DEFAULTS, **payload.model_dump(), "user_email": user_email}
+    ref = await create_document_async("application", app_doc)
+    return {"reference": ref, "status": app_doc["status"]}
 
 @app.get("/applications", response_model=List[dict])
-def list_applications(token: str):
-    user_email = awaitable_get_user(token)
-    items = get_documents("application", {"user_email": user_email}, limit=50)
-    # Convert ObjectId to string
-    for it in items:
-        it["_id"] = str(it["_id"])
-    return items
+async def list_applications(user_email: str = Depends(get_current_user)):
+    # Project only the listed fields and let Mongo stringify ObjectIds
+    pipeline = [
+        {"$match": {"user_email": user_email}},
+        {"$limit": 50},
+        {"$project": {"doc_type": 1, "status": 1, "reference_id": 1, "metadata": 1, "_id": {"$toString": "$_id"}}},
+    ]
+    return await _collection("application").aggregate(pipeline).to_list(length=50)
 
 # Payments (mock init)
 @app.post("/payments/init", response_model=dict)
-def init_payment(payload: PaymentInit, token: str):
-    user_email = awaitable_get_user(token)
-    pay = Payment(user_email=user_email, purpose=payload.purpose, amount=payload.amount, application_ref=payload.application_ref)
-    pid = create_document("payment", pay)
+async def init_payment(payload: PaymentInit, user_email: str = Depends(get_current_user)):
+    pay = {**_PAYMENT_DEFAULTS, **payload.model_dump(), "user_email": user_email}
+    pid = await create_document_async("payment", pay)
     return {"payment_id": pid, "status": "initiated"}
 
 # Predictive search: seed static items and allow prefix search over keywords/label
@@ -123,15 +235,40 @@ SEARCH_ITEMS: List[SearchItem] = [
     SearchItem(key="passport", label="Apply for Passport", category="Travel", url="/guide/passport", keywords=["psk", "tatkaal", "seva"]),
 ]
 
+# Request-independent search data, computed once at import
+_SEARCH_HAY = [" ".join([item.label, item.category, *item.keywords]).lower() for item in SEARCH_ITEMS]
+_SEARCH_PREFIX_TERMS = [tuple(t.lower() for t in [item.key] + item.keywords) for item in SEARCH_ITEMS]
+_SEARCH_DUMP = [item.model_dump() for item in SEARCH_ITEMS]
+
+# Prefix index over keys and keywords in a static marisa-trie, so the per-character
+# walk runs in C. Each trie key id maps to the item indexes that carry that term.
+# Label and category words need no trie entries: the substring scan over _SEARCH_HAY covers them.
+def _build_search_trie(prefix_terms: List[tuple]):
+    trie = marisa_trie.Trie({term for terms in prefix_terms for term in terms})
+    term_items: List[set] = [set() for _ in range(len(trie))]
+    for i, terms in enumerate(prefix_terms):
+        for term in terms:
+            term_items[trie[term]].add(i)
+    return trie, term_items
+
+def _trie_lookup(prefix: str) -> set:
+    ids = set()
+    for _, term_id in _SEARCH_TRIE.iteritems(prefix):
+        ids |= _SEARCH_TERM_ITEMS[term_id]
+    return ids
+
+_SEARCH_TRIE, _SEARCH_TERM_ITEMS = _build_search_trie(_SEARCH_PREFIX_TERMS)
+
+# Results depend only on the normalised query, so cache the encoded body;
+# autocomplete traffic is dominated by a handful of short prefixes.
+@lru_cache(maxsize=1024)
+def _search_impl(ql: str) -> bytes:
+    ids = _trie_lookup(ql) | {i for i, hay in enumerate(_SEARCH_HAY) if ql in hay}
+    return orjson.dumps({"results": [_SEARCH_DUMP[i] for i in sorted(ids)][:8]})
+
 @app.get("/search")
-def predictive_search(q: str):
-    ql = q.lower().strip()
-    results = []
-    for item in SEARCH_ITEMS:
-        hay = " ".join([item.label, item.category] + item.keywords).lower()
-        if ql in hay or any(k.startswith(ql) for k in [item.key] + item.keywords):
-            results.append(item.model_dump())
-    return {"results": results[:8]}
+async def predictive_search(q: str):
+    return Response(_search_impl(q.lower().strip()), media_type="application/json")
 
 # Static content endpoints for guides (Plain Language)
 GUIDES = {}
@@ -212,23 +349,20 @@ GUIDES["passport"] = {
     ],
 }
 
+# Guides are immutable, so encode them once and serve the shared bytes
+_GUIDES_JSON = {k: orjson.dumps(v) for k, v in GUIDES.items()}
+
 @app.get("/guides/{key}")
-def get_guide(key: str):
-    if key not in GUIDES:
+async def get_guide(key: str):
+    body = _GUIDES_JSON.get(key)
+    if body is None:
         raise HTTPException(status_code=404, detail="Guide not found")
-    return GUIDES[key]
-
-# Helper to use dependency-style auth without FastAPI Depends for simplicity in this environment
-
-def awaitable_get_user(token: str) -> str:
-    if not token:
-        raise HTTPException(status_code=401, detail="Missing token")
-    sess = _collection("session").find_one({"token": token, "expires_at": {"$gt": datetime.now(timezone.utc)}})
-    if not sess:
-        raise HTTPException(status_code=401, detail="Invalid or expired token")
-    return sess["user_email"]
+    return Response(body, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+    # Multiple workers need the app as an import string so each process can load it.
+    # "auto" picks uvloop/httptools when installed and falls back where they are not (Windows, PyPy).
+    uvicorn.run("main:app", host="0.0.0.0", port=port, loop="auto", http="auto", workers=workers)
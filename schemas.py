@@ -3,10 +3,12 @@ Database Schemas for Citizen Hub
 
 Each Pydantic model represents a collection (lowercased class name).
 """
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, EmailStr
 from typing import Optional, Literal, List
 from datetime import datetime
 
+DocType = Literal["aadhaar", "pan", "dl", "voter", "passport"]
+
 class User(BaseModel):
     name: str = Field(..., description="Full name")
     email: EmailStr = Field(..., description="Email address")
@@ -14,13 +16,16 @@ class User(BaseModel):
     is_active: bool = Field(True, description="Active user")
 
 class Session(BaseModel):
+    # Built once per login and never mutated
+    model_config = ConfigDict(frozen=True)
+
     user_email: EmailStr = Field(...)
     token: str = Field(..., description="Session token (opaque)")
     expires_at: datetime = Field(..., description="Expiry timestamp (UTC)")
 
 class Application(BaseModel):
     user_email: EmailStr
-    doc_type: Literal["aadhaar", "pan", "dl", "voter", "passport"]
+    doc_type: DocType
     status: Literal["draft", "submitted", "in_review", "approved", "rejected"] = "draft"
     reference_id: Optional[str] = None
     metadata: dict = Field(default_factory=dict)
@@ -36,6 +41,9 @@ class Payment(BaseModel):
 
 # Search index document for predictive search suggestions
 class SearchItem(BaseModel):
+    # Seeded at import and shared across requests
+    model_config = ConfigDict(frozen=True)
+
     key: str
     label: str
     category: str
@@ -11,6 +11,7 @@ if [ ! -z "$PIDS" ]; then
   sleep 2
 fi
 
+# Set CORS_ORIGINS (comma-separated) to the frontend origin(s), or browsers will be blocked
 mkdir -p logs
 echo "Installing dependencies..."
 pip install -r requirements.txt